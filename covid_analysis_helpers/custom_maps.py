@@ -1,8 +1,10 @@
+import functools
 import pandas as pd
 import plotly.express as px
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
-from typing import List
+from typing import Dict, List, Tuple
+from covid_analysis_helpers.text_format import prefix_title
 
 my_colors = ["red"]
 mapbox_style = "carto-positron"
@@ -22,6 +24,9 @@ def map_dots(
     animation: str = None,
 ) -> Figure:
     """Function to draw information on map."""
+    hover_data, hover_labels = _build_hover(
+        tuple(labels), size, lat, lon, color
+    )
     fig = px.scatter_mapbox(
         df,
         lat=lat,
@@ -33,16 +38,22 @@ def map_dots(
         opacity=0.5,
         zoom=6,
         hover_name=hover_name,
-        hover_data={
-            size: False,
-            lat: False,
-            lon: False,
-            color: False,
-        }
-        | {i: True for i in labels},
-        labels={i: i.split("_")[0].title() for i in labels},
+        hover_data=dict(hover_data),
+        labels=dict(hover_labels),
         title=title,
         animation_frame=animation,
     )
     fig.update_layout(mapbox_style=mapbox_style, width=600, height=600)
     return fig
+
+
+@functools.lru_cache(maxsize=64)
+def _build_hover(
+    labels: Tuple[str, ...], size: str, lat: str, lon: str, color: str
+) -> Tuple[Dict[str, bool], Dict[str, str]]:
+    """Small function to build hover data and labels for map_dots,
+    cached as the same label sets recur between maps."""
+    hidden = [i for i in (size, lat, lon, color) if i is not None]
+    hover_data = {i: i in labels for i in hidden + list(labels)}
+    hover_labels = {i: prefix_title(i) for i in labels}
+    return hover_data, hover_labels
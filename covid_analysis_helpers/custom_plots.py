@@ -1,6 +1,8 @@
 # Last updated May 30, 2023
 # Version 0.1.0
 
+import functools
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -8,10 +10,10 @@ from matplotlib.figure import Figure
 from matplotlib.container import BarContainer
 import plotly.graph_objs as go
 import matplotlib.ticker as mticker
-from typing import List
+from typing import Callable, List, Tuple
 from seaborn import FacetGrid
+from covid_analysis_helpers.text_format import titlecase, prefix_title
 import warnings
-warnings.simplefilter(action='ignore', category=FutureWarning)
 
 # Parameters for plots
 my_colors = ["steelblue", "coral", "firebrick"]
@@ -20,10 +22,24 @@ barlabel_fontsize = 10
 title_fontsize = 14
 
 
+def ignore_future_warnings(fn: Callable) -> Callable:
+    """Decorator to silence FutureWarnings raised by seaborn while
+    drawing, without changing the global warnings filters."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@ignore_future_warnings
 def plot_available_data(df: pd.DataFrame, title: str) -> Figure:
     """Function to draw bar plots with the percentage
     of available data in the dataframe columns."""
-    available_data = (1 - df.isna().mean()) * 100
+    available_data = df.count().div(len(df)).mul(100)
     fig = plt.figure()
     ax = sns.barplot(
         y=available_data.index, x=available_data.values, color=my_colors[0]
@@ -43,6 +59,7 @@ def plot_available_data(df: pd.DataFrame, title: str) -> Figure:
     return fig
 
 
+@ignore_future_warnings
 def population_pyramid(
     df: pd.DataFrame,
     columns: List[str],
@@ -77,6 +94,7 @@ def population_pyramid(
     return fig
 
 
+@ignore_future_warnings
 def barplot_counts(
     sr: pd.Series,
     ylabel: str,
@@ -84,11 +102,16 @@ def barplot_counts(
     percentage: bool = False,
     min_value: float = 0,
     custom_yticks: list = None,
+    top_k: int = None,
 ) -> Figure:
     """Function to draw barplot from value counts."""
     fig = plt.figure()
-    # Set the minimum value to show
-    sr = (sr[sr >= min_value]).sort_values(ascending=False)
+    # Set the minimum value and optionally the number of largest values to show
+    sr = sr[sr.ge(min_value)]
+    if top_k is not None:
+        sr = sr.nlargest(top_k)
+    else:
+        sr = sr.sort_values(ascending=False)
     ax = sns.barplot(y=sr.index, x=sr.values, color=my_colors[0])
     # Optional custom y tick labels
     if custom_yticks is not None:
@@ -113,6 +136,7 @@ def barplot_counts(
     return fig
 
 
+@ignore_future_warnings
 def histplot_2groups(
     df: pd.DataFrame, x: str, hue: str, hue_order: List[str], title: str
 ) -> Figure:
@@ -131,7 +155,7 @@ def histplot_2groups(
     # Set title cases to legend
     ax.legend(
         handles=[ax.containers[1][0], ax.containers[0][0]],
-        title=hue.replace("_", " ").title(),
+        title=titlecase(hue),
         labels=[i.title() for i in hue_order],
     )
     ax.grid(axis="x")
@@ -140,6 +164,7 @@ def histplot_2groups(
     return fig
 
 
+@ignore_future_warnings
 def histplots_facet(
     df: pd.DataFrame,
     x: str,
@@ -172,7 +197,7 @@ def histplots_facet(
     # Set title cases to legend
     grid.figure.legend(
         handles=grid.legend.get_patches(),
-        title=hue.replace("_", " ").title(),
+        title=titlecase(hue),
         labels=[i.title() for i in hue_order],
         loc="center right",
     )
@@ -187,6 +212,7 @@ def histplots_facet(
     return grid
 
 
+@ignore_future_warnings
 def histplots_count_percent(
     df: pd.DataFrame, y: str, hue: str, hue_order: List[str], title: str
 ) -> Figure:
@@ -243,7 +269,7 @@ def histplots_count_percent(
     # Set title cases to legend
     axs[0].legend(
         handles=axs[0].get_legend().legendHandles,
-        title=hue.replace("_", " ").title(),
+        title=titlecase(hue),
         labels=[i.title() for i in hue_order],
     )
     # Format x and y axis
@@ -256,6 +282,7 @@ def histplots_count_percent(
     return fig
 
 
+@ignore_future_warnings
 def box_strip_plot(
     df: pd.DataFrame, x: str, y: str, order: List[str], title: str, ylabel: str
 ) -> Figure:
@@ -281,7 +308,7 @@ def box_strip_plot(
         palette=my_colors[: len(order)],
     )
     plt.ylabel(ylabel)
-    plt.xlabel(x.replace("_", " ").title())
+    plt.xlabel(titlecase(x))
     plt.title(title, fontsize=title_fontsize)
     return fig
 
@@ -293,50 +320,77 @@ def timeseries_new_accumulated(
     title: str,
 ) -> Figure:
     """Function to draw new and accumulated timeseries data from a dataframe with date index."""
+    # cached templates are shared, so only the changed axes are copied
+    bar_kwargs, scatter_kwargs = _ts_trace_template(new, accumulated)
+    layout = _ts_layout_template(new, accumulated, title)
+    layout = {
+        **layout,
+        "yaxis": {
+            **layout["yaxis"],
+            "range": [0, np.nanmax(df[new].to_numpy())],
+        },
+        "yaxis2": {
+            **layout["yaxis2"],
+            "range": [0, np.nanmax(df[accumulated].to_numpy())],
+        },
+    }
     weekday = df.index.day_name()  # for weekly fluctuation awareness
-    new_data = go.Bar(
-        x=df.index,
-        y=df[new],
-        name=new.split("_")[0].title(),
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(x=df.index, y=df[new], customdata=weekday, **bar_kwargs)
+    )
+    fig.add_trace(go.Scatter(x=df.index, y=df[accumulated], **scatter_kwargs))
+    fig.update_layout(**layout)
+    return fig
+
+
+@functools.lru_cache(maxsize=32)
+def _ts_trace_template(new: str, accumulated: str) -> Tuple[dict, dict]:
+    """Small function to build the static trace arguments of
+    timeseries_new_accumulated, cached for repeated plotting."""
+    bar_kwargs = dict(
+        name=prefix_title(new),
         opacity=0.6,
         marker={"color": my_colors[0]},
-        customdata=weekday,
         hovertemplate="%{y} (%{customdata})",
     )
-    accumulated_data = go.Scatter(
-        x=df.index,
-        y=df[accumulated],
-        name=accumulated.split("_")[0].title(),
+    scatter_kwargs = dict(
+        name=prefix_title(accumulated),
         yaxis="y2",
         marker={"color": my_colors[1]},
     )
-    fig = go.Figure()
-    fig.add_trace(new_data)
-    fig.add_trace(accumulated_data)
+    return bar_kwargs, scatter_kwargs
+
 
-    fig.update_layout(
+@functools.lru_cache(maxsize=32)
+def _ts_layout_template(new: str, accumulated: str, title: str) -> dict:
+    """Small function to build the layout of timeseries_new_accumulated
+    without axis ranges, cached for repeated plotting."""
+    return dict(
         title=title,
         hovermode="x unified",
         xaxis={"title": "Date"},
-        yaxis={
-            "title": new.replace("_", " ").title(),
-            "range": [0, max(df[new])],
-        },
+        yaxis={"title": titlecase(new)},
         yaxis2={
-            "title": accumulated.replace("_", " ").title(),
+            "title": titlecase(accumulated),
             "overlaying": "y",
             "side": "right",
-            "range": [0, max(df[accumulated])],
         },
         showlegend=False,
         template=None,
     )
-    return fig
 
 
 def format_container_labels(container: BarContainer, fmt: str) -> List[str]:
     """Function to format labels for bar containers."""
-    return [fmt.format(x) if x != 0 else "" for x in container.datavalues]
+    return list(_format_values(tuple(container.datavalues.tolist()), fmt))
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_values(values: Tuple[float, ...], fmt: str) -> Tuple[str, ...]:
+    """Small function to format non-zero values, cached as the same
+    values and formats recur between plots."""
+    return tuple(fmt.format(x) if x != 0 else "" for x in values)
 
 
 def format_pyramid_title(df: pd.DataFrame, column: str) -> str:
@@ -1,9 +1,19 @@
+import functools
+import os
 import pandas as pd
 import numpy as np
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 
+NAT_NS = np.iinfo(np.int64).min  # NaT as int64 nanoseconds
+DAY_NS = 86_400_000_000_000  # nanoseconds in a day
+NUMBA_MIN_ROWS = 1_000_000  # below this the pandas path is faster than JIT
 
-def load_cases_data(path: str) -> pd.DataFrame:
+# last age decade codes (0s, 10s, ...) of the young and middle age categories
+YOUNG_MAX_CODE = 2  # 20s
+MIDDLE_MAX_CODE = 5  # 50s
+
+
+def load_cases_data(path: str, force_reload: bool = False) -> pd.DataFrame:
     """Function to load data of COVID-19 infection cases in South Korea.
     Available columns:
     * `case_id`: the ID of the infection case. (case_id(7) = region_code(5) +
@@ -21,30 +31,44 @@ def load_cases_data(path: str) -> pd.DataFrame:
     * `confirmed`: the accumulated number of the confirmed
     * `latitude`: the latitude of the group (WGS84)
     * `longitude`: the longitude of the group (WGS84)
+    Processed data is cached next to the csv file, `force_reload` bypasses it.
     """
-    df = pd.read_csv(path)
+    df = read_processed_cache(path, force_reload)
+    if df is not None:
+        return df
+
+    # load data with final data types, missing coordinates are given as -
+    # (float32 keeps ~5 decimal places of coordinates, enough for maps).
+    # The header has a leading space (" case_id"), skipinitialspace strips
+    # it, as well as leading spaces of values, so dtypes match column names.
+    df = pd.read_csv(
+        path,
+        skipinitialspace=True,
+        dtype={
+            "case_id": "string",
+            "confirmed": "int32",
+            "latitude": "float32",
+            "longitude": "float32",
+        },
+        na_values={"latitude": ["-"], "longitude": ["-"]},
+    )
     print(path + " successfully loaded into dataframe.")
-    df = df.rename(columns=lambda x: x.strip())
-
-    # fill in missing coordinates and create substitute city (province name)
-    # if actual city is not provided or infection is from other city
-    df.loc[df["latitude"] == "-", ["latitude", "longitude"]] = np.nan
-    without_city = df["city"] == "-"  # mask
-    df.loc[without_city, "city"] = df.loc[without_city, "province"]
-    df["sub_city"] = df["city"]
-    other_city = df["city"] == "from other city"  # mask
-    df.loc[other_city, "sub_city"] = df.loc[other_city, "province"]
-    print("Helper column 'sub_city' created.")
 
-    # change data types of other columns
-    df = df.astype({"case_id": str, "latitude": float, "longitude": float})
+    # create substitute city (province name) if actual city
+    # is not provided or infection is from other city
+    df["city"] = df["city"].where(df["city"] != "-", df["province"])
+    df["sub_city"] = df["city"].where(
+        df["city"] != "from other city", df["province"]
+    )
+    print("Helper column 'sub_city' created.")
 
     print("\nData types of each column:")
     print(df.dtypes)
+    write_processed_cache(df, path)
     return df
 
 
-def load_patient_info(path: str) -> pd.DataFrame:
+def load_patient_info(path: str, force_reload: bool = False) -> pd.DataFrame:
     """Function to load epidemiological data of COVID-19 patients
     in South Korea. Available columns:
     * `patient_id`: the ID of the patient (patient_id(10) =
@@ -64,28 +88,12 @@ def load_patient_info(path: str) -> pd.DataFrame:
     * `released_date`: the date of being released
     * `deceased_date`: the date of being deceased
     * `state`: isolated / released / deceased (isolation and release in and from Hospital)
+    Processed data is cached next to the csv file, `force_reload` bypasses it.
     """
+    df = read_processed_cache(path, force_reload)
+    if df is not None:
+        return df
 
-    # load data while parsing dates
-    df = pd.read_csv(
-        path,
-        parse_dates=[
-            "symptom_onset_date",
-            "confirmed_date",
-            "released_date",
-            "deceased_date",
-        ],
-    )
-    df["symptom_onset_date"] = (
-        df["symptom_onset_date"].str.strip().astype("datetime64")
-    )
-    print(path + " successfully loaded into dataframe.")
-
-    # deal with contact_number if - or patient ID provided
-    df.loc[df["contact_number"] == "-", "contact_number"] = np.nan
-    df.loc[df["contact_number"].str.len() == 10, "contact_number"] = np.nan
-
-    # change data types of other columns
     age_dtype = pd.CategoricalDtype(
         categories=[
             "0s",
@@ -102,43 +110,49 @@ def load_patient_info(path: str) -> pd.DataFrame:
         ],
         ordered=True,
     )
-    df = df.astype(
-        {
+
+    # load data with final data types while parsing dates (symptom onset
+    # has blank entries, so it is coerced separately)
+    df = pd.read_csv(
+        path,
+        dtype={
             "patient_id": str,
             "age": age_dtype,
             "sex": "category",
             "state": "category",
-            "contact_number": "float32",
-        }
+            "contact_number": str,
+        },
+        parse_dates=[
+            "confirmed_date",
+            "released_date",
+            "deceased_date",
+        ],
+    )
+    df["symptom_onset_date"] = pd.to_datetime(
+        df["symptom_onset_date"].str.strip(), errors="coerce"
+    )
+    print(path + " successfully loaded into dataframe.")
+
+    # deal with contact_number if - or patient ID (10 digits) provided
+    contact_number = pd.to_numeric(df["contact_number"], errors="coerce")
+    df["contact_number"] = contact_number.where(contact_number < 1e9).astype(
+        "float32"
     )
 
-    # create age category column
+    # create age category column and intervals between relevant dates
     age_cat_dtype = pd.CategoricalDtype(
         categories=["young", "middle", "old"], ordered=True
     )
-    df["age_category"] = (
-        df["age"].apply(lambda x: assign_age_category(x)).astype(age_cat_dtype)
-    )
+    derive_patient_columns(df, age_cat_dtype)
     print(
         "Column 'age_category' created. Defines young (0-29), middle (30-59), and old (60+)."
     )
-
-    # calculate intervals between relevant dates
-    df["symptom_to_confirmed"] = df.apply(
-        lambda x: (x.confirmed_date - x.symptom_onset_date).days, axis=1
-    ).astype("float32")
     print(
         "Column 'symptom_to_confirmed' created. Defines number of days from symptom onset to confirmation."
     )
-    df["confirmed_to_released"] = df.apply(
-        lambda x: (x.released_date - x.confirmed_date).days, axis=1
-    ).astype("float32")
     print(
         "Column 'confirmed_to_released' created. Defines number of days from confirmation to release."
     )
-    df["confirmed_to_deceased"] = df.apply(
-        lambda x: (x.deceased_date - x.confirmed_date).days, axis=1
-    ).astype("float32")
     print(
         "Column 'confirmed_to_deceased' created. Defines number of days from confirmation to decease."
     )
@@ -148,10 +162,45 @@ def load_patient_info(path: str) -> pd.DataFrame:
     print("Dataframe index set to 'patient_id'.")
     print("\nData types of each column:")
     print(df.dtypes)
+    write_processed_cache(df, path)
+
+    return df
+
 
+def read_processed_cache(
+    path: str, force_reload: bool = False
+) -> Optional[pd.DataFrame]:
+    """Function to load previously processed data of a csv file from its
+    parquet cache. Returns None if the cache is missing, older than the csv
+    file or this module, or cannot be read."""
+    cache_path = path + ".processed.parquet"
+    if force_reload or not os.path.isfile(cache_path):
+        return None
+    # processing logic may have changed since the cache was written
+    newest_source = max(os.path.getmtime(path), os.path.getmtime(__file__))
+    if os.path.getmtime(cache_path) < newest_source:
+        return None
+    try:
+        df = pd.read_parquet(cache_path)
+    except (ImportError, OSError, ValueError):  # no engine or corrupt file
+        return None
+    print(cache_path + " successfully loaded into dataframe.")
+    print("\nData types of each column:")
+    print(df.dtypes)
     return df
 
 
+def write_processed_cache(df: pd.DataFrame, path: str) -> None:
+    """Function to store processed data of a local csv file as parquet,
+    skipped if no parquet engine is installed or the file cannot be written."""
+    if not os.path.isfile(path):  # e.g. csv loaded from URL
+        return
+    try:
+        df.to_parquet(path + ".processed.parquet", compression="zstd")
+    except (ImportError, OSError, ValueError) as e:
+        print(f"\nProcessed data not cached: {e}")
+
+
 def update_time_df(
     df: pd.DataFrame,
     expand: List[str],
@@ -170,15 +219,16 @@ def update_time_df(
         df_new = df[expand].diff()
 
     df_new = df_new.fillna(value=df)
-    df_new = df_new.astype(int)
-    df_new[ratio_column_name] = df_new[ratio[0]] / df_new[ratio[1]]
-    df_new = df_new.add_prefix("new_")
+    df_new[expand] = df_new[expand].astype("int32")
+    df_new[ratio_column_name] = calculate_ratio(
+        df_new[ratio[0]], df_new[ratio[1]]
+    )
+    columns = expand + [ratio_column_name]
+    df_new.rename(columns={c: "new_" + c for c in columns}, inplace=True)
 
     # update old dataframe
-    df[ratio_column_name] = df[ratio[0]] / df[ratio[1]]
-    expand.append(ratio_column_name)
-    for column in expand:
-        df.rename(columns={column: "accumulated_" + column}, inplace=True)
+    df[ratio_column_name] = calculate_ratio(df[ratio[0]], df[ratio[1]])
+    df.rename(columns={c: "accumulated_" + c for c in columns}, inplace=True)
 
     # concat both
     df = pd.concat([df, df_new], axis=1)
@@ -186,17 +236,142 @@ def update_time_df(
     return df
 
 
-def assign_age_category(x):
-    """Small function to infer age category.
+def calculate_ratio(
+    numerator: pd.Series, denominator: pd.Series
+) -> np.ndarray:
+    """Small function to divide two columns into a float32 array,
+    leaving NaN where the denominator is zero."""
+    denominator = denominator.to_numpy(dtype=np.float32)
+    out = np.full(len(denominator), np.nan, dtype=np.float32)
+    np.divide(
+        numerator.to_numpy(dtype=np.float32),
+        denominator,
+        out=out,
+        where=denominator != 0,
+    )
+    return out
+
+
+def derive_patient_columns(
+    df: pd.DataFrame, age_cat_dtype: pd.CategoricalDtype
+) -> None:
+    """Function to add age category and intervals between relevant dates
+    to the patient dataframe. Uses a fused numba kernel if available
+    and the table has at least NUMBA_MIN_ROWS rows."""
+    kernel = patient_kernel() if len(df) >= NUMBA_MIN_ROWS else None
+    if kernel is None:
+        df["age_category"] = assign_age_category(df["age"], age_cat_dtype)
+        df["symptom_to_confirmed"] = (
+            df["confirmed_date"] - df["symptom_onset_date"]
+        ).dt.days.astype("float32")
+        df["confirmed_to_released"] = (
+            df["released_date"] - df["confirmed_date"]
+        ).dt.days.astype("float32")
+        df["confirmed_to_deceased"] = (
+            df["deceased_date"] - df["confirmed_date"]
+        ).dt.days.astype("float32")
+        return
+
+    n = len(df)
+    out_sc = np.empty(n, dtype=np.float32)
+    out_cr = np.empty(n, dtype=np.float32)
+    out_cd = np.empty(n, dtype=np.float32)
+    out_cat = np.empty(n, dtype=np.int8)
+    # dates as int64 nanoseconds, NaT becomes NAT_NS
+    dates = [
+        df[column].to_numpy().view("int64")
+        for column in [
+            "symptom_onset_date",
+            "confirmed_date",
+            "released_date",
+            "deceased_date",
+        ]
+    ]
+    kernel(
+        *dates,
+        df["age"].cat.codes.to_numpy(),
+        out_sc,
+        out_cr,
+        out_cd,
+        out_cat,
+    )
+    df["age_category"] = pd.Categorical.from_codes(
+        out_cat, dtype=age_cat_dtype
+    )
+    df["symptom_to_confirmed"] = out_sc
+    df["confirmed_to_released"] = out_cr
+    df["confirmed_to_deceased"] = out_cd
+
+
+@functools.lru_cache(maxsize=1)
+def patient_kernel() -> Optional[Callable]:
+    """Function to import numba and compile the fused kernel for
+    derive_patient_columns on first use. Returns None without numba."""
+    try:
+        from numba import njit, prange
+    except ImportError:  # numba is optional, pandas is used without it
+        return None
+
+    @njit(parallel=True, cache=True)
+    def _compute_patient_derived(
+        sym_ns,
+        conf_ns,
+        rel_ns,
+        dec_ns,
+        age_codes,
+        out_sc,
+        out_cr,
+        out_cd,
+        out_cat,
+    ):
+        """Kernel computing day intervals and age category codes
+        in a single parallel pass over the patient rows."""
+        for i in prange(len(conf_ns)):
+            conf = conf_ns[i]
+            if conf == NAT_NS or sym_ns[i] == NAT_NS:
+                out_sc[i] = np.nan
+            else:
+                out_sc[i] = (conf - sym_ns[i]) // DAY_NS
+            if conf == NAT_NS or rel_ns[i] == NAT_NS:
+                out_cr[i] = np.nan
+            else:
+                out_cr[i] = (rel_ns[i] - conf) // DAY_NS
+            if conf == NAT_NS or dec_ns[i] == NAT_NS:
+                out_cd[i] = np.nan
+            else:
+                out_cd[i] = (dec_ns[i] - conf) // DAY_NS
+            # same mapping as assign_age_category
+            code = age_codes[i]
+            if code < 0:
+                out_cat[i] = -1
+            elif code <= YOUNG_MAX_CODE:
+                out_cat[i] = 0
+            elif code <= MIDDLE_MAX_CODE:
+                out_cat[i] = 1
+            else:
+                out_cat[i] = 2
+
+    return _compute_patient_derived
+
+
+def assign_age_category(
+    age: pd.Series, dtype: pd.CategoricalDtype
+) -> pd.Categorical:
+    """Small function to infer age categories of a whole `age` column of
+    ordered age decades (e.g. "100s" is old), missing age stays missing.
     young: 0-29,
     middle: 30-59,
     old: 60+
     """
-    if pd.isnull(x):
-        return np.nan
-    elif x <= "20s":
-        return "young"
-    elif x <= "50s":
-        return "middle"
-    else:
-        return "old"
+    codes = age.cat.codes.to_numpy()
+    # missing age stays -1
+    cat_codes = np.where(
+        codes < 0,
+        -1,
+        np.where(
+            codes <= YOUNG_MAX_CODE,
+            0,
+            np.where(codes <= MIDDLE_MAX_CODE, 1, 2),
+        ),
+    )
+    return pd.Categorical.from_codes(cat_codes, dtype=dtype)
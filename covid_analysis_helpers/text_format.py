@@ -0,0 +1,13 @@
+import functools
+
+
+@functools.lru_cache(maxsize=256)
+def titlecase(s: str) -> str:
+    """Small function to turn a column name into a title."""
+    return s.replace("_", " ").title()
+
+
+@functools.lru_cache(maxsize=256)
+def prefix_title(s: str) -> str:
+    """Small function to turn the first word of a column name into a title."""
+    return s.split("_")[0].title()